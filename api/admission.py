@@ -0,0 +1,117 @@
+"""
+Admission control for PathPilot FHIR API
+Bounds concurrency per route cost class and sheds load when queues saturate
+"""
+
+import asyncio
+import math
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Dict, Optional
+
+# Route cost classes, cheapest first
+BY_ID = "by_id"
+INDEXED_SEARCH = "indexed_search"
+FULL_SCAN = "full_scan"
+AGGREGATE = "aggregate"
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted to its pool"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionPool:
+    """Bounded concurrency pool with a bounded wait queue"""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, deadline: float):
+        """
+        Initialize pool
+
+        Args:
+            name: Cost class served by this pool
+            max_concurrency: Requests allowed to run at once
+            max_queue: Requests allowed to wait for a slot (beyond that: 429)
+            deadline: Seconds a request may wait for a slot (beyond that: 503)
+        """
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.deadline = deadline
+        # A queued request gets a slot within one deadline or is shed, so that
+        # is a fair hint for when a retry can expect to be admitted
+        self.retry_after = max(1, math.ceil(deadline))
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold a slot for the duration of the request"""
+        if self._semaphore is None:
+            # Created lazily so it binds to the running event loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()  # Free slot - does not suspend
+        elif self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(429, f"{self.name} queue is full", self.retry_after)
+        else:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.deadline)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                raise AdmissionRejected(503, f"{self.name} request not started within {self.deadline}s",
+                                        self.retry_after)
+            finally:
+                self.waiting -= 1
+
+        self.active += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def get_stats(self) -> dict:
+        """Get pool statistics"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "deadline_seconds": self.deadline,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out
+        }
+
+
+# Global pools - cheap, latency-sensitive classes get wide pools and short
+# deadlines; scans and aggregates run a few at a time and queue behind them.
+# Admitted requests run in FastAPI's threadpool (40 threads by default), so the
+# total concurrency (31) stays below it and admitted work never waits for a thread
+admission_pools: Dict[str, AdmissionPool] = {
+    BY_ID: AdmissionPool(BY_ID, max_concurrency=16, max_queue=64, deadline=2),
+    INDEXED_SEARCH: AdmissionPool(INDEXED_SEARCH, max_concurrency=12, max_queue=32, deadline=5),
+    FULL_SCAN: AdmissionPool(FULL_SCAN, max_concurrency=2, max_queue=8, deadline=30),
+    AGGREGATE: AdmissionPool(AGGREGATE, max_concurrency=1, max_queue=4, deadline=60),
+}
+
+
+def get_admission_statistics() -> dict:
+    """Get statistics for all admission pools"""
+    stats = {name: pool.get_stats() for name, pool in admission_pools.items()}
+    stats["timestamp"] = datetime.now().isoformat()
+    return stats
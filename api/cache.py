@@ -4,13 +4,14 @@ Optimized for static test data with long TTLs
 """
 
 import hashlib
+import threading
 import time
 from typing import Any, Optional, Callable, Dict, Union
 from functools import wraps
 from datetime import datetime, timedelta
 
 class InMemoryCache:
-    """Simple in-memory cache with TTL support"""
+    """Simple in-memory cache with TTL support (thread-safe)"""
 
     def __init__(self, default_ttl: Optional[int] = None, max_size: int = 1000):
         """
@@ -25,6 +26,8 @@ class InMemoryCache:
         self.max_size = max_size
         self.hits = 0
         self.misses = 0
+        # Sync endpoints run in FastAPI's threadpool and share these caches
+        self._lock = threading.Lock()
 
     def _is_expired(self, timestamp: Optional[float]) -> bool:
         """Check if cached item has expired"""
@@ -41,48 +44,60 @@ class InMemoryCache:
 
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache"""
-        if key in self.cache:
-            value, expiry = self.cache[key]
-            if not self._is_expired(expiry):
-                self.hits += 1
-                return value
-            else:
-                # Remove expired entry
-                del self.cache[key]
-
-        self.misses += 1
-        return None
+        with self._lock:
+            if key in self.cache:
+                value, expiry = self.cache[key]
+                if not self._is_expired(expiry):
+                    self.hits += 1
+                    return value
+                else:
+                    # Remove expired entry
+                    del self.cache[key]
+
+            self.misses += 1
+            return None
+
+    def contains(self, key: str) -> bool:
+        """Check for a live entry without counting a hit or miss"""
+        with self._lock:
+            if key not in self.cache:
+                return False
+            return not self._is_expired(self.cache[key][1])
 
     def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
         """Set value in cache"""
         ttl = ttl if ttl is not None else self.default_ttl
         expiry = (time.time() + ttl) if ttl else None  # None = never expires
 
-        self._evict_lru()
-        self.cache[key] = (value, expiry)
+        with self._lock:
+            self._evict_lru()
+            self.cache[key] = (value, expiry)
 
     def clear(self, pattern: Optional[str] = None) -> int:
         """Clear cache entries matching pattern or all if pattern is None"""
-        if pattern is None:
-            count = len(self.cache)
-            self.cache.clear()
-            return count
-
-        keys_to_delete = [k for k in self.cache.keys() if pattern in k]
-        for key in keys_to_delete:
-            del self.cache[key]
-        return len(keys_to_delete)
+        with self._lock:
+            if pattern is None:
+                count = len(self.cache)
+                self.cache.clear()
+                return count
+
+            keys_to_delete = [k for k in self.cache.keys() if pattern in k]
+            for key in keys_to_delete:
+                del self.cache[key]
+            return len(keys_to_delete)
 
     def get_stats(self) -> dict:
         """Get cache statistics"""
-        total_requests = self.hits + self.misses
-        hit_rate = (self.hits / total_requests * 100) if total_requests > 0 else 0
+        with self._lock:
+            hits, misses, size = self.hits, self.misses, len(self.cache)
+        total_requests = hits + misses
+        hit_rate = (hits / total_requests * 100) if total_requests > 0 else 0
 
         return {
-            "size": len(self.cache),
+            "size": size,
             "max_size": self.max_size,
-            "hits": self.hits,
-            "misses": self.misses,
+            "hits": hits,
+            "misses": misses,
             "hit_rate": f"{hit_rate:.1f}%",
             "default_ttl_hours": (self.default_ttl / 3600) if self.default_ttl else "Never expires"
         }
@@ -127,6 +142,8 @@ def cache_result(cache: InMemoryCache, ttl: Optional[int] = None):
         # Add cache control methods to the wrapper
         wrapper.cache_clear = lambda: cache.clear(func.__name__)
         wrapper.cache_stats = lambda: cache.get_stats()
+        wrapper.cache_contains = lambda *args, **kwargs: cache.contains(
+            f"{func.__name__}:{generate_cache_key(*args, **kwargs)}")
 
         return wrapper
     return decorator
@@ -159,6 +176,8 @@ def cache_async_result(cache: InMemoryCache, ttl: Optional[int] = None):
         # Add cache control methods to the wrapper
         wrapper.cache_clear = lambda: cache.clear(func.__name__)
         wrapper.cache_stats = lambda: cache.get_stats()
+        wrapper.cache_contains = lambda *args, **kwargs: cache.contains(
+            f"{func.__name__}:{generate_cache_key(*args, **kwargs)}")
 
         return wrapper
     return decorator
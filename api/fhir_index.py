@@ -0,0 +1,317 @@
+"""
+On-disk index for PathPilot FHIR API
+Maps resource ids and outgoing references to byte offsets in the NDJSON files
+so lookups and _include/_revinclude joins read only the lines they need
+"""
+
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# (file path, byte offset of the resource's line)
+Location = Tuple[str, int]
+
+# Elements always kept by an _elements projection
+MANDATORY_ELEMENTS = ('resourceType', 'id', 'meta')
+SUBSETTED_TAG = {
+    "system": "http://terminology.hl7.org/CodeSystem/v3-ObservationValue",
+    "code": "SUBSETTED"
+}
+
+
+def project(resource: Dict, elements: Optional[Tuple[str, ...]]) -> Dict:
+    """Apply an _elements projection, tagging the result as SUBSETTED"""
+    if not elements:
+        return resource
+    projected = {k: v for k, v in resource.items() if k in elements or k in MANDATORY_ELEMENTS}
+    meta = dict(projected.get('meta', {}))
+    meta['tag'] = meta.get('tag', []) + [SUBSETTED_TAG]
+    projected['meta'] = meta
+    return projected
+
+
+def split_reference(reference: str) -> Optional[Tuple[str, str]]:
+    """Split a reference such as 'Patient/123' (or a full URL) into (type, id)"""
+    parts = reference.rstrip('/').split('/')
+    if len(parts) < 2 or not parts[-2] or not parts[-1]:
+        return None
+    return parts[-2], parts[-1]
+
+
+def _collect_references(value: Any, found: List[str]) -> None:
+    """Recursively collect every reference string below a resource element"""
+    if isinstance(value, dict):
+        reference = value.get('reference')
+        if isinstance(reference, str):
+            found.append(reference)
+        for child in value.values():
+            if isinstance(child, (dict, list)):
+                _collect_references(child, found)
+    elif isinstance(value, list):
+        for child in value:
+            _collect_references(child, found)
+
+
+def search_param_name(element: str) -> str:
+    """
+    Map an element name to its FHIR search parameter name
+
+    The choice-type suffix is dropped and camelCase becomes kebab-case, e.g.
+    medicationReference -> medication, serviceProvider -> service-provider.
+    Parameter names that are already kebab-case are returned unchanged.
+    """
+    if element.endswith('Reference') and element != 'Reference':
+        element = element[:-len('Reference')]
+    return re.sub(r'(?<!^)(?=[A-Z])', '-', element).lower()
+
+
+def extract_references(resource: Dict) -> Dict[str, List[str]]:
+    """
+    Extract outgoing references from a resource keyed by search parameter name
+
+    The parameter name is derived from the top-level element holding the
+    reference (see search_param_name). References to a Patient are also exposed
+    under 'patient', matching how the search endpoints treat subject/patient
+    interchangeably.
+    """
+    references: Dict[str, List[str]] = {}
+    for element, value in resource.items():
+        if not isinstance(value, (dict, list)):
+            continue
+        found: List[str] = []
+        _collect_references(value, found)
+        if not found:
+            continue
+        param = search_param_name(element)
+        references.setdefault(param, []).extend(found)
+        if param != 'patient':
+            patient_refs = [r for r in found if r.startswith('Patient/') or '/Patient/' in r]
+            if patient_refs:
+                references.setdefault('patient', []).extend(patient_refs)
+    return references
+
+
+class ResourceIndex:
+    """Id and reference index over the NDJSON files of one resource type"""
+
+    def __init__(self, resource_type: str, filepaths: List[str]):
+        """
+        Initialize index (built lazily on first use)
+
+        Args:
+            resource_type: FHIR resource type covered by this index
+            filepaths: NDJSON files holding resources of this type
+        """
+        self.resource_type = resource_type
+        self.filepaths = filepaths
+        self.by_id: Dict[str, Location] = {}
+        # search parameter -> "Type/id" -> locations of resources referencing it
+        self.by_reference: Dict[str, Dict[str, List[Location]]] = {}
+        self.total = 0
+        self.built = False
+        self._lock = threading.Lock()
+
+    def build(self) -> None:
+        """Scan the files once, recording offsets for ids and references"""
+        with self._lock:
+            if self.built:
+                return
+            for filepath in self.filepaths:
+                try:
+                    with open(filepath, 'rb') as f:
+                        offset = 0
+                        for line in f:
+                            location = (filepath, offset)
+                            offset += len(line)
+                            if not line.strip():
+                                continue
+                            resource = json.loads(line)
+                            self.total += 1
+                            resource_id = resource.get('id')
+                            if resource_id:
+                                self.by_id.setdefault(resource_id, location)
+                            for param, refs in extract_references(resource).items():
+                                targets = self.by_reference.setdefault(param, {})
+                                for ref in set(refs):
+                                    parsed = split_reference(ref)
+                                    if parsed:
+                                        targets.setdefault(f"{parsed[0]}/{parsed[1]}", []).append(location)
+                except FileNotFoundError:
+                    pass  # File doesn't exist, nothing to index
+                except Exception as e:
+                    print(f"Error indexing {filepath}: {e}")
+            self.built = True
+
+    def _ensure_built(self) -> None:
+        if not self.built:
+            self.build()
+
+    def get(self, resource_id: str, elements: Optional[Tuple[str, ...]] = None) -> Optional[Dict]:
+        """Read a single resource by id"""
+        self._ensure_built()
+        location = self.by_id.get(resource_id)
+        if location is None:
+            return None
+        return read_locations([location], elements)[0]
+
+    def get_many(self, resource_ids: Iterable[str]) -> List[Dict]:
+        """Read several resources by id in one batch (unknown ids are skipped)"""
+        self._ensure_built()
+        locations = [self.by_id[i] for i in dict.fromkeys(resource_ids) if i in self.by_id]
+        return read_locations(locations)
+
+    def count(self, param: Optional[str] = None, target: Optional[str] = None) -> int:
+        """Count resources (optionally those whose `param` references `target`) without reading them"""
+        self._ensure_built()
+        if param is None:
+            return self.total
+        return len(self.by_reference.get(param, {}).get(target, []))
+
+    def referencing(self, param: str, targets: Iterable[str], limit: Optional[int] = None,
+                    elements: Optional[Tuple[str, ...]] = None) -> List[Dict]:
+        """Read the resources whose `param` element references any of `targets`"""
+        self._ensure_built()
+        index = self.by_reference.get(param, {})
+        locations: List[Location] = []
+        for target in targets:
+            locations.extend(index.get(target, []))
+        locations = list(dict.fromkeys(locations))
+        return read_locations(locations[:limit] if limit else locations, elements)
+
+
+def read_locations(locations: List[Location], elements: Optional[Tuple[str, ...]] = None) -> List[Dict]:
+    """Read resources at the given offsets, opening each file once"""
+    by_file: Dict[str, List[int]] = {}
+    for filepath, offset in locations:
+        by_file.setdefault(filepath, []).append(offset)
+
+    resources: Dict[Location, Dict] = {}
+    for filepath, offsets in by_file.items():
+        with open(filepath, 'rb') as f:
+            for offset in sorted(offsets):
+                f.seek(offset)
+                resources[(filepath, offset)] = project(json.loads(f.readline()), elements)
+    return [resources[location] for location in locations]
+
+
+class FHIRIndex:
+    """Registry of per-type indexes"""
+
+    def __init__(self):
+        self.indexes: Dict[str, ResourceIndex] = {}
+
+    def configure(self, data_dir: str, file_mappings: Dict[str, List[str]]) -> None:
+        """Register the files for each resource type (indexes build on first use or via build_all)"""
+        self.indexes = {
+            resource_type: ResourceIndex(
+                resource_type,
+                [os.path.join(data_dir, filename) for filename in files]
+            )
+            for resource_type, files in file_mappings.items()
+        }
+
+    def __getitem__(self, resource_type: str) -> ResourceIndex:
+        return self.indexes[resource_type]
+
+    def __contains__(self, resource_type: str) -> bool:
+        return resource_type in self.indexes
+
+    def is_built(self, resource_type: Optional[str] = None) -> bool:
+        """Check whether one index (or, with no type, every index) is ready"""
+        if resource_type is not None:
+            return self.indexes[resource_type].built
+        return all(index.built for index in self.indexes.values())
+
+    def build_all(self) -> None:
+        """Build every index, smallest data first so cheap types are ready soonest"""
+        def data_size(index: ResourceIndex) -> int:
+            return sum(os.path.getsize(p) for p in index.filepaths if os.path.exists(p))
+
+        for index in sorted(self.indexes.values(), key=data_size):
+            index.build()
+        print("FHIR indexes built")
+
+    def build_in_background(self) -> threading.Thread:
+        """Start building every index in a daemon thread"""
+        thread = threading.Thread(target=self.build_all, name="fhir-index-build", daemon=True)
+        thread.start()
+        return thread
+
+    def resolve_includes(self, resources: List[Dict], resource_type: str,
+                         includes: List[str], revincludes: List[str],
+                         limit: Optional[int] = None) -> Tuple[List[Dict], bool]:
+        """
+        Resolve _include / _revinclude for a page of matched resources
+
+        Args:
+            resources: The matched resources (search.mode = match)
+            resource_type: Type of the matched resources
+            includes: Values such as 'MedicationRequest:medication' or
+                'Encounter:location:Location'
+            revincludes: Values such as 'Observation:subject'
+            limit: Maximum number of included resources (None = unbounded)
+
+        Returns:
+            (included resources, truncated) - included resources are deduplicated
+            and exclude the matches themselves; truncated is True when `limit`
+            cut the result short
+
+        Raises:
+            ValueError: On a malformed include value
+        """
+        seen: Set[str] = {f"{resource_type}/{r.get('id')}" for r in resources}
+        included: List[Dict] = []
+        truncated = False
+
+        def add(found: List[Dict]) -> None:
+            nonlocal truncated
+            for resource in found:
+                key = f"{resource.get('resourceType')}/{resource.get('id')}"
+                if key in seen:
+                    continue
+                if limit is not None and len(included) >= limit:
+                    truncated = True
+                    return
+                seen.add(key)
+                included.append(resource)
+
+        def remaining() -> Optional[int]:
+            # Read one past the cap so overflow is detected without reading everything
+            return None if limit is None else limit - len(included) + 1
+
+        for value in includes:
+            source_type, param, target_type = parse_include(value)
+            if source_type != resource_type:
+                continue
+            wanted: Dict[str, List[str]] = {}
+            for resource in resources:
+                for ref in extract_references(resource).get(param, []):
+                    parsed = split_reference(ref)
+                    if parsed and parsed[0] in self.indexes and (target_type is None or parsed[0] == target_type):
+                        wanted.setdefault(parsed[0], []).append(parsed[1])
+            for ref_type, ids in wanted.items():
+                ids = [i for i in dict.fromkeys(ids) if f"{ref_type}/{i}" not in seen]
+                add(self.indexes[ref_type].get_many(ids[:remaining()]))
+
+        targets = [f"{resource_type}/{r.get('id')}" for r in resources if r.get('id')]
+        for value in revincludes:
+            source_type, param, target_type = parse_include(value)
+            if source_type not in self.indexes or (target_type is not None and target_type != resource_type):
+                continue
+            add(self.indexes[source_type].referencing(param, targets, limit=remaining()))
+
+        return included, truncated
+
+
+def parse_include(value: str) -> Tuple[str, str, Optional[str]]:
+    """Parse 'Source:param[:Target]' into its parts"""
+    parts = value.split(':')
+    if len(parts) not in (2, 3) or not parts[0] or not parts[1]:
+        raise ValueError(f"Invalid include parameter: {value}")
+    return parts[0], search_param_name(parts[1]), parts[2] if len(parts) == 3 else None
+
+
+# Global index instance, configured at import time by main.py
+fhir_index = FHIRIndex()
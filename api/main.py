@@ -6,10 +6,12 @@ FHIR R4 compliant API with MIMIC-IV demo data (Oracle Health compatible)
 
 import json
 import os
+from itertools import islice
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
@@ -20,30 +22,38 @@ from cache import (
     get_cache_statistics,
     clear_all_caches
 )
+from fhir_index import fhir_index, project
+from admission import (
+    BY_ID,
+    INDEXED_SEARCH,
+    FULL_SCAN,
+    AGGREGATE,
+    AdmissionRejected,
+    admission_pools,
+    get_admission_statistics
+)
 
 # Data directory - files are read on-demand, not loaded into memory
 data_dir = "data/mimic-iv-clinical-database-demo-on-fhir-2.1.0/fhir"
 
-@cache_fhir_resource()  # Never expires - static data
-def read_ndjson_file(filepath: str, filter_func=None, limit: int = None):
-    """Read NDJSON file from disk with optional filtering"""
-    results = []
+def iter_ndjson_file(filepath: str, filter_func=None, elements: Optional[tuple] = None):
+    """Stream resources from an NDJSON file with optional filtering and _elements projection"""
     try:
         with open(filepath, 'r') as f:
             for line in f:
-                if limit and len(results) >= limit:
-                    break
                 if line.strip():
                     resource = json.loads(line)
                     if filter_func is None or filter_func(resource):
-                        results.append(resource)
-                        if limit and len(results) >= limit:
-                            break
+                        yield project(resource, elements)
     except FileNotFoundError:
-        pass  # File doesn't exist, return empty list
+        pass  # File doesn't exist, nothing to yield
     except Exception as e:
         print(f"Error reading {filepath}: {e}")
-    return results
+
+@cache_fhir_resource()  # Never expires - static data
+def read_ndjson_file(filepath: str, limit: int = None, elements: Optional[tuple] = None):
+    """Read NDJSON file from disk (unfiltered only - filter closures can't be cache keys)"""
+    return list(islice(iter_ndjson_file(filepath, elements=elements), limit))
 
 # File mappings for each resource type
 FILE_MAPPINGS = {
@@ -72,7 +82,10 @@ FILE_MAPPINGS = {
     'Specimen': ['MimicSpecimen.ndjson', 'MimicSpecimenLab.ndjson']
 }
 
-def get_resources(resource_type: str, filter_func=None, limit: int = None):
+# Id/reference indexes are built lazily per resource type on first lookup
+fhir_index.configure(data_dir, FILE_MAPPINGS)
+
+def get_resources(resource_type: str, filter_func=None, limit: int = None, elements: Optional[tuple] = None):
     """Read resources from disk for a given type with optional filtering"""
     results = []
     files = FILE_MAPPINGS.get(resource_type, [])
@@ -81,21 +94,103 @@ def get_resources(resource_type: str, filter_func=None, limit: int = None):
         if limit and len(results) >= limit:
             break
         filepath = os.path.join(data_dir, filename)
-        file_results = read_ndjson_file(
-            filepath,
-            filter_func,
-            limit - len(results) if limit else None
-        )
-        results.extend(file_results)
+        remaining = limit - len(results) if limit else None
+        if filter_func is None:
+            results.extend(read_ndjson_file(filepath, remaining, elements))
+        else:
+            # Filtered scans are streamed, not memoised
+            results.extend(islice(iter_ndjson_file(filepath, filter_func, elements), remaining))
 
     return results[:limit] if limit else results
 
-def create_bundle(resources: List[Dict], resource_type: str, total: Optional[int] = None) -> Dict:
+def count_matching(resource_type: str, filter_func) -> int:
+    """Count resources matching a filter in one streaming pass, without keeping them"""
+    return sum(
+        1
+        for filename in FILE_MAPPINGS.get(resource_type, [])
+        for _ in iter_ndjson_file(os.path.join(data_dir, filename), filter_func)
+    )
+
+def find_resources(resource_type: str, patient: Optional[str] = None, filter_func=None,
+                   limit: int = None, elements: Optional[tuple] = None):
+    """Read matching resources, going through the patient reference index when a patient is given"""
+    if not patient:
+        return get_resources(resource_type, filter_func, limit, elements)
+
+    index = fhir_index[resource_type]
+    if filter_func is None:
+        return index.referencing('patient', [f"Patient/{patient}"], limit, elements)
+
+    matches = [r for r in index.referencing('patient', [f"Patient/{patient}"]) if filter_func(r)]
+    return [project(r, elements) for r in (matches[:limit] if limit else matches)]
+
+def parse_elements(_elements: Optional[str]) -> Optional[tuple]:
+    """Parse a comma-separated _elements value into a hashable projection"""
+    if not _elements:
+        return None
+    return tuple(sorted({e.strip() for e in _elements.split(',') if e.strip()}))
+
+def is_count_summary(_summary: Optional[str]) -> bool:
+    """Check for _summary=count; other _summary values are ignored like unknown parameters"""
+    return _summary == 'count'
+
+def count_resources(resource_type: str, patient: Optional[str] = None) -> int:
+    """Count resources from index cardinalities, without reading them"""
+    index = fhir_index[resource_type]
+    if patient:
+        return index.count('patient', f"Patient/{patient}")
+    return index.count()
+
+# Upper bound on included resources per requested match (_count)
+MAX_INCLUDED_PER_MATCH = 10
+
+def get_included_resources(resources: List[Dict], resource_type: str, _include: Optional[List[str]],
+                           _revinclude: Optional[List[str]], _count: Optional[int]):
+    """
+    Resolve _include/_revinclude as batched index joins, capped relative to _count
+
+    Returns (included resources, OperationOutcome warning or None if nothing was cut)
+    """
+    if not _include and not _revinclude:
+        return [], None
+    limit = (_count or 100) * MAX_INCLUDED_PER_MATCH
+    try:
+        included, truncated = fhir_index.resolve_includes(
+            resources, resource_type, _include or [], _revinclude or [], limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    outcome = None
+    if truncated:
+        outcome = {
+            "resourceType": "OperationOutcome",
+            "issue": [{
+                "severity": "warning",
+                "code": "too-costly",
+                "diagnostics": f"Included resources truncated to {limit}; narrow the search or lower _count"
+            }]
+        }
+    return included, outcome
+
+def search_bundle(resource_type: str, patient: Optional[str] = None, filter_func=None,
+                  _count: Optional[int] = None, _elements: Optional[str] = None,
+                  _include: Optional[List[str]] = None, _revinclude: Optional[List[str]] = None) -> Dict:
+    """Run a search and build its Bundle, with _include/_revinclude results"""
+    elements = parse_elements(_elements)
+    # _include follows the matches' references, so those are projected only afterwards
+    resources = find_resources(resource_type, patient, filter_func, _count, None if _include else elements)
+    included, outcome = get_included_resources(resources, resource_type, _include, _revinclude, _count)
+    if _include and elements:
+        resources = [project(r, elements) for r in resources]
+    return create_bundle(resources, resource_type, included=included, outcome=outcome)
+
+def create_bundle(resources: List[Dict], resource_type: str, total: Optional[int] = None,
+                  included: Optional[List[Dict]] = None, outcome: Optional[Dict] = None) -> Dict:
     """Create a FHIR Bundle response"""
     bundle = {
         "resourceType": "Bundle",
         "type": "searchset",
-        "total": total or len(resources),
+        "total": total if total is not None else len(resources),
         "link": [{
             "relation": "self",
             "url": f"/{resource_type}"
@@ -107,7 +202,14 @@ def create_bundle(resources: List[Dict], resource_type: str, total: Optional[int
                 "search": {"mode": "match"}
             }
             for r in resources
-        ]
+        ] + [
+            {
+                "fullUrl": f"/{r['resourceType']}/{r['id']}",
+                "resource": r,
+                "search": {"mode": "include"}
+            }
+            for r in included or []
+        ] + ([{"resource": outcome, "search": {"mode": "outcome"}}] if outcome else [])
     }
     return bundle
 
@@ -121,6 +223,9 @@ async def lifespan(app: FastAPI):
         print(f"WARNING: Data directory not found: {data_dir}")
     else:
         print("Data files available - will be read on-demand")
+        # Build indexes off the request path; until a type's index is ready its
+        # indexed requests are admitted as full scans (see classify_request)
+        fhir_index.build_in_background()
     yield
     # Shutdown
     print("PathPilot API Shutting down...")
@@ -133,6 +238,65 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Largest unfiltered page treated as cheap - it reads only the first _count lines
+MAX_CHEAP_PAGE = 1000
+
+def page_size(params) -> Optional[int]:
+    """Parse _count as the handlers would (default 100); None if it is invalid"""
+    try:
+        return int(params.get('_count', 100))
+    except ValueError:
+        return None
+
+def classify_request(path: str, params) -> Optional[str]:
+    """Map a request to its admission cost class (None = not admission controlled)"""
+    # Aggregates are expensive only when cold; a cached response is a dict lookup
+    if path == '/api/patient-intelligence':
+        return None if get_patient_intelligence.cache_contains() else AGGREGATE
+    if path == '/patients-summary':
+        count = page_size(params)
+        if count is not None and get_patients_summary.cache_contains(_count=count):
+            return None
+        return AGGREGATE
+
+    parts = [p for p in path.split('/') if p]
+    if not parts or parts[0] not in FILE_MAPPINGS:
+        return None  # Metadata, cache and docs endpoints are cheap
+    resource_type = parts[0]
+
+    # A cold index is built on first use - a request that needs it is a full scan
+    if len(parts) == 2:
+        return BY_ID if fhir_index.is_built(resource_type) else FULL_SCAN
+    if (params.get('_include') or params.get('_revinclude')) and not fhir_index.is_built():
+        return FULL_SCAN  # Joins may touch any type's index
+    if params.get('category') and not params.get('patient'):
+        return FULL_SCAN
+    if params.get('patient') or params.get('_summary') == 'count':
+        return INDEXED_SEARCH if fhir_index.is_built(resource_type) else FULL_SCAN
+
+    # Unfiltered page: bounded read, usually served from the file cache
+    count = page_size(params)
+    if count is not None and 0 < count <= MAX_CHEAP_PAGE:
+        return INDEXED_SEARCH
+    return FULL_SCAN
+
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    """Bound concurrency per cost class, shedding load with 429/503 when saturated"""
+    cost_class = classify_request(request.url.path, request.query_params)
+    if cost_class is None:
+        return await call_next(request)
+
+    try:
+        async with admission_pools[cost_class].slot():
+            return await call_next(request)
+    except AdmissionRejected as e:
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"detail": e.detail},
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
 # Enable CORS for browser testing
 app.add_middleware(
     CORSMiddleware,
@@ -169,6 +333,11 @@ async def clear_cache():
     """Clear all caches (admin endpoint)"""
     return clear_all_caches()
 
+@app.get("/admission/stats")
+async def get_admission_stats():
+    """Get admission control statistics"""
+    return get_admission_statistics()
+
 @app.get("/metadata")
 async def capability_statement():
     """FHIR Capability Statement"""
@@ -199,6 +368,11 @@ async def capability_statement():
 @cache_patient_data()  # Never expires - static data
 async def get_patient_intelligence():
     """Generate patient intelligence from real FHIR data"""
+    # Blocking disk/CPU work runs off the event loop so cheap requests keep flowing
+    return await run_in_threadpool(build_patient_intelligence)
+
+def build_patient_intelligence():
+    """Build the patient intelligence payload"""
     import random
     from datetime import datetime
 
@@ -211,15 +385,13 @@ async def get_patient_intelligence():
     for idx, patient in enumerate(patients_data):
         patient_id = patient.get('id', '')
 
-        # Get ALL real observations for this patient
-        observations = get_resources('Observation',
-                                    lambda o: o.get('subject', {}).get('reference', '').endswith(f"/{patient_id}"))
-                                    # No limit - get all observations
+        # Get ALL real observations for this patient (only interpretation is needed)
+        observations = fhir_index['Observation'].referencing('patient', [f"Patient/{patient_id}"],
+                                                             elements=('interpretation',))
 
         # Get ALL real conditions for this patient
-        conditions = get_resources('Condition',
-                                 lambda c: c.get('subject', {}).get('reference', '').endswith(f"/{patient_id}"))
-                                 # No limit - get all conditions
+        conditions = fhir_index['Condition'].referencing('patient', [f"Patient/{patient_id}"],
+                                                         elements=('code',))
 
         # Count critical and abnormal labs from real data
         critical_count = 0
@@ -309,204 +481,213 @@ async def get_patient_intelligence():
         'patients': patient_list
     }
 
-# Generic resource endpoints
-@app.get("/{resource_type}")
-async def get_resources_generic(
-    resource_type: str,
-    patient: Optional[str] = Query(None),
-    _count: Optional[int] = Query(100)
-):
-    """Get all resources of a type with optional filtering"""
-    if resource_type not in FILE_MAPPINGS:
-        raise HTTPException(status_code=404, detail=f"Resource type {resource_type} not found")
+# Patient summary endpoint - also MUST come before generic routes
+@app.get("/patients-summary")
+@cache_patient_data()  # Never expires - static data
+async def get_patients_summary(_count: Optional[int] = Query(100)):
+    """Get enriched patient list with metadata for selection"""
+    return await run_in_threadpool(build_patients_summary, _count)
 
-    # Create filter function if patient specified
-    filter_func = None
-    if patient:
-        def filter_func(r):
-            # Check various patient reference fields
-            if 'patient' in r and r['patient'].get('reference', '').endswith(f"/{patient}"):
-                return True
-            elif 'subject' in r and r['subject'].get('reference', '').endswith(f"/{patient}"):
-                return True
-            return False
+def build_patients_summary(_count: Optional[int]):
+    """Build the enriched patient list"""
+    patients = get_resources('Patient', limit=_count, elements=('birthDate', 'gender', 'name'))
 
-    # Read from disk with filtering
-    resources = get_resources(resource_type, filter_func, _count)
+    patient_summaries = []
 
-    return create_bundle(resources, resource_type)
+    # Curated labels for the demo's showcase patients
+    clinical_labels = {
+        '77e10fd0-6a1c-5547-a130-fae1341acf36': 'ICU - Multi-organ failure',
+        '73fb53d8-f1fa-53cd-a25c-2314caccbb99': 'ICU - Cardiac surgery',
+        '8e77dd0b-932d-5790-9ba6-5c6df8434457': 'ICU - Respiratory failure',
+        'e1de99bc-3bc5-565e-9ee6-69675b9cc267': 'Chronic - Diabetes',
+        '4365e125-c049-525a-9459-16d5e6947ad2': 'Chronic - CKD',
+        '4f773083-7f4d-5378-b839-c24ca1e15434': 'Chronic - Heart failure',
+        'a2605b15-4f1b-5839-b4ce-fb7a6bc1005f': 'ED - Trauma',
+        'e2beb281-c44f-579b-8211-a3749c549e92': 'ED - Acute MI',
+        '8adbf3e4-47ff-561e-b1b6-746ee32e056d': 'ED - Stroke',
+        'dd2bf984-33c3-5874-8f68-84113327877e': 'Complex - Multiple comorbidities',
+    }
 
-@app.get("/{resource_type}/{resource_id}")
-async def get_resource_by_id(resource_type: str, resource_id: str):
-    """Get a specific resource by ID"""
-    if resource_type not in FILE_MAPPINGS:
-        raise HTTPException(status_code=404, detail=f"Resource type {resource_type} not found")
+    for patient in patients:
+        patient_id = patient.get('id')
+        patient_ref = f"Patient/{patient_id}"
 
-    # Read from disk until we find the matching ID
-    def filter_func(r):
-        return r.get('id') == resource_id
+        # Counts come straight from index cardinalities - no resource reads
+        obs_count = count_resources('Observation', patient_id)
+        encounter_count = count_resources('Encounter', patient_id)
+        condition_count = count_resources('Condition', patient_id)
 
-    resources = get_resources(resource_type, filter_func, limit=1)
+        if obs_count > 30000:
+            data_quality = 'excellent'
+        elif obs_count >= 1000:
+            data_quality = 'good'
+        else:
+            data_quality = 'moderate'
 
-    if resources:
-        return resources[0]
+        # Get conditions (top 3)
+        conditions = fhir_index['Condition'].referencing('patient', [patient_ref], limit=3, elements=('code',))
 
-    raise HTTPException(status_code=404, detail=f"{resource_type}/{resource_id} not found")
+        # Calculate age from birthDate
+        birth_date = patient.get('birthDate', '')
+        age = 2024 - int(birth_date[:4]) if birth_date else 'Unknown'
+
+        summary = {
+            'id': patient_id,
+            'name': patient.get('name', [{}])[0].get('family', f'Patient_{patient_id[:8]}'),
+            'gender': patient.get('gender', 'unknown'),
+            'age': age,
+            'birthDate': birth_date,
+            'observationCount': obs_count,
+            'encounterCount': encounter_count,
+            'conditionCount': condition_count,
+            'conditions': [c.get('code', {}).get('text', 'Unknown')[:50] for c in conditions],
+            'dataQuality': data_quality,
+            'clinicalLabel': clinical_labels.get(patient_id, 'Standard patient')
+        }
+
+        patient_summaries.append(summary)
+
+    # Sort by observation count
+    patient_summaries.sort(key=lambda x: x['observationCount'], reverse=True)
+
+    return {
+        'total': len(patient_summaries),
+        'patients': patient_summaries
+    }
 
 # Specific Oracle-compatible endpoints with better search support
 @app.get("/Patient")
-async def get_patients(_count: Optional[int] = Query(100)):
+def get_patients(
+    _count: Optional[int] = Query(100),
+    _summary: Optional[str] = Query(None),
+    _elements: Optional[str] = Query(None),
+    _include: Optional[List[str]] = Query(None),
+    _revinclude: Optional[List[str]] = Query(None)
+):
     """Get all patients"""
-    patients = get_resources('Patient', limit=_count)
-    return create_bundle(patients, 'Patient')
+    if is_count_summary(_summary):
+        return create_bundle([], 'Patient', total=count_resources('Patient'))
+
+    return search_bundle('Patient', None, None, _count, _elements, _include, _revinclude)
 
 @app.get("/Patient/{patient_id}")
-async def get_patient(patient_id: str):
+def get_patient(patient_id: str, _elements: Optional[str] = Query(None)):
     """Get specific patient"""
-    patients = get_resources('Patient', lambda p: p.get('id') == patient_id, limit=1)
-    if patients:
-        return patients[0]
+    patient = fhir_index['Patient'].get(patient_id, parse_elements(_elements))
+    if patient:
+        return patient
     raise HTTPException(status_code=404, detail=f"Patient/{patient_id} not found")
 
 @app.get("/Encounter")
-async def get_encounters(
+def get_encounters(
     patient: Optional[str] = Query(None),
-    _count: Optional[int] = Query(100)
+    _count: Optional[int] = Query(100),
+    _summary: Optional[str] = Query(None),
+    _elements: Optional[str] = Query(None),
+    _include: Optional[List[str]] = Query(None),
+    _revinclude: Optional[List[str]] = Query(None)
 ):
     """Get encounters with optional patient filter"""
-    filter_func = None
-    if patient:
-        filter_func = lambda e: e.get('subject', {}).get('reference', '').endswith(f"/{patient}")
+    if is_count_summary(_summary):
+        return create_bundle([], 'Encounter', total=count_resources('Encounter', patient))
 
-    encounters = get_resources('Encounter', filter_func, _count)
-    return create_bundle(encounters, 'Encounter')
+    return search_bundle('Encounter', patient, None, _count, _elements, _include, _revinclude)
 
 @app.get("/Observation")
-async def get_observations(
+def get_observations(
     patient: Optional[str] = Query(None),
     category: Optional[str] = Query(None),
-    _count: Optional[int] = Query(100)
+    _count: Optional[int] = Query(100),
+    _summary: Optional[str] = Query(None),
+    _elements: Optional[str] = Query(None),
+    _include: Optional[List[str]] = Query(None),
+    _revinclude: Optional[List[str]] = Query(None)
 ):
     """Get observations with optional filters"""
     def filter_func(o):
-        # Apply patient filter
-        if patient and not o.get('subject', {}).get('reference', '').endswith(f"/{patient}"):
-            return False
-        # Apply category filter
-        if category and not any(cat.get('coding', [{}])[0].get('code') == category
-                              for cat in o.get('category', [])):
-            return False
-        return True
-
-    filter_func = filter_func if (patient or category) else None
-    observations = get_resources('Observation', filter_func, _count)
-    return create_bundle(observations, 'Observation')
+        # Apply category filter (patient filtering goes through the index)
+        return any(cat.get('coding', [{}])[0].get('code') == category
+                   for cat in o.get('category', []))
+
+    filter_func = filter_func if category else None
+
+    if is_count_summary(_summary):
+        if category and patient:
+            # Category is not indexed; filter the patient's observations
+            total = len(find_resources('Observation', patient, filter_func, elements=('id',)))
+        elif category:
+            # Category is not indexed; count matches in a streaming scan
+            total = count_matching('Observation', filter_func)
+        else:
+            total = count_resources('Observation', patient)
+        return create_bundle([], 'Observation', total=total)
+
+    return search_bundle('Observation', patient, filter_func, _count, _elements, _include, _revinclude)
 
 @app.get("/Condition")
-async def get_conditions(
+def get_conditions(
     patient: Optional[str] = Query(None),
-    _count: Optional[int] = Query(100)
+    _count: Optional[int] = Query(100),
+    _summary: Optional[str] = Query(None),
+    _elements: Optional[str] = Query(None),
+    _include: Optional[List[str]] = Query(None),
+    _revinclude: Optional[List[str]] = Query(None)
 ):
     """Get conditions with optional patient filter"""
-    filter_func = None
-    if patient:
-        filter_func = lambda c: c.get('subject', {}).get('reference', '').endswith(f"/{patient}")
+    if is_count_summary(_summary):
+        return create_bundle([], 'Condition', total=count_resources('Condition', patient))
 
-    conditions = get_resources('Condition', filter_func, _count)
-    return create_bundle(conditions, 'Condition')
+    return search_bundle('Condition', patient, None, _count, _elements, _include, _revinclude)
 
 @app.get("/MedicationRequest")
-async def get_medication_requests(
+def get_medication_requests(
     patient: Optional[str] = Query(None),
-    _count: Optional[int] = Query(100)
+    _count: Optional[int] = Query(100),
+    _summary: Optional[str] = Query(None),
+    _elements: Optional[str] = Query(None),
+    _include: Optional[List[str]] = Query(None),
+    _revinclude: Optional[List[str]] = Query(None)
 ):
     """Get medication requests with optional patient filter"""
-    filter_func = None
-    if patient:
-        filter_func = lambda m: m.get('subject', {}).get('reference', '').endswith(f"/{patient}")
+    if is_count_summary(_summary):
+        return create_bundle([], 'MedicationRequest', total=count_resources('MedicationRequest', patient))
 
-    requests = get_resources('MedicationRequest', filter_func, _count)
-    return create_bundle(requests, 'MedicationRequest')
+    return search_bundle('MedicationRequest', patient, None, _count, _elements, _include, _revinclude)
 
-@app.get("/patients-summary")
-@cache_patient_data()  # Never expires - static data
-async def get_patients_summary(_count: Optional[int] = Query(100)):
-    """Get enriched patient list with metadata for selection"""
-    patients = get_resources('Patient', limit=_count)
-
-    patient_summaries = []
-
-    # Pre-computed top patients with high observation counts
-    high_volume_patients = {
-        '77e10fd0-6a1c-5547-a130-fae1341acf36': {'obs_count': 48114, 'label': 'ICU - Multi-organ failure'},
-        '73fb53d8-f1fa-53cd-a25c-2314caccbb99': {'obs_count': 40615, 'label': 'ICU - Cardiac surgery'},
-        '8e77dd0b-932d-5790-9ba6-5c6df8434457': {'obs_count': 36772, 'label': 'ICU - Respiratory failure'},
-        'e1de99bc-3bc5-565e-9ee6-69675b9cc267': {'obs_count': 34489, 'label': 'Chronic - Diabetes'},
-        '4365e125-c049-525a-9459-16d5e6947ad2': {'obs_count': 33309, 'label': 'Chronic - CKD'},
-        '4f773083-7f4d-5378-b839-c24ca1e15434': {'obs_count': 30924, 'label': 'Chronic - Heart failure'},
-        'a2605b15-4f1b-5839-b4ce-fb7a6bc1005f': {'obs_count': 28169, 'label': 'ED - Trauma'},
-        'e2beb281-c44f-579b-8211-a3749c549e92': {'obs_count': 28122, 'label': 'ED - Acute MI'},
-        '8adbf3e4-47ff-561e-b1b6-746ee32e056d': {'obs_count': 27883, 'label': 'ED - Stroke'},
-        'dd2bf984-33c3-5874-8f68-84113327877e': {'obs_count': 25511, 'label': 'Complex - Multiple comorbidities'},
-    }
-
-    for patient in patients:
-        patient_id = patient.get('id')
-
-        # Get observation count (use pre-computed for known patients)
-        if patient_id in high_volume_patients:
-            obs_count = high_volume_patients[patient_id]['obs_count']
-            clinical_label = high_volume_patients[patient_id]['label']
-            data_quality = 'excellent' if obs_count > 30000 else 'good'
-        else:
-            # For other patients, estimate counts (reading minimal data)
-            observations = get_resources('Observation',
-                                       lambda o: o.get('subject', {}).get('reference', '').endswith(f"/{patient_id}"),
-                                       limit=100)
-            obs_count = len(observations)
-            clinical_label = 'Standard patient'
-            data_quality = 'moderate' if obs_count < 1000 else 'good'
-
-        # Get encounter count
-        encounters = get_resources('Encounter',
-                                  lambda e: e.get('subject', {}).get('reference', '').endswith(f"/{patient_id}"),
-                                  limit=10)  # Just count a few for summary
-
-        # Get conditions (top 3)
-        conditions = get_resources('Condition',
-                                 lambda c: c.get('subject', {}).get('reference', '').endswith(f"/{patient_id}"),
-                                 limit=3)
+# Generic endpoints - MUST come after the specific routes above, which they would
+# otherwise shadow (routes are matched in registration order)
+@app.get("/{resource_type}")
+def get_resources_generic(
+    resource_type: str,
+    patient: Optional[str] = Query(None),
+    _count: Optional[int] = Query(100),
+    _summary: Optional[str] = Query(None),
+    _elements: Optional[str] = Query(None),
+    _include: Optional[List[str]] = Query(None),
+    _revinclude: Optional[List[str]] = Query(None)
+):
+    """Get all resources of a type with optional filtering"""
+    if resource_type not in FILE_MAPPINGS:
+        raise HTTPException(status_code=404, detail=f"Resource type {resource_type} not found")
 
-        # Calculate age from birthDate
-        birth_date = patient.get('birthDate', '')
-        age = 2024 - int(birth_date[:4]) if birth_date else 'Unknown'
+    if is_count_summary(_summary):
+        return create_bundle([], resource_type, total=count_resources(resource_type, patient))
 
-        summary = {
-            'id': patient_id,
-            'name': patient.get('name', [{}])[0].get('family', f'Patient_{patient_id[:8]}'),
-            'gender': patient.get('gender', 'unknown'),
-            'age': age,
-            'birthDate': birth_date,
-            'observationCount': obs_count,
-            'encounterCount': len(encounters),
-            'conditionCount': len(conditions),
-            'conditions': [c.get('code', {}).get('text', 'Unknown')[:50] for c in conditions],
-            'dataQuality': data_quality,
-            'clinicalLabel': clinical_label
-        }
+    # Patient searches go through the reference index (patient or subject references)
+    return search_bundle(resource_type, patient, None, _count, _elements, _include, _revinclude)
 
-        patient_summaries.append(summary)
+@app.get("/{resource_type}/{resource_id}")
+def get_resource_by_id(resource_type: str, resource_id: str, _elements: Optional[str] = Query(None)):
+    """Get a specific resource by ID"""
+    if resource_type not in FILE_MAPPINGS:
+        raise HTTPException(status_code=404, detail=f"Resource type {resource_type} not found")
 
-    # Sort by observation count
-    patient_summaries.sort(key=lambda x: x['observationCount'], reverse=True)
+    resource = fhir_index[resource_type].get(resource_id, parse_elements(_elements))
+    if resource:
+        return resource
 
-    return {
-        'total': len(patient_summaries),
-        'patients': patient_summaries
-    }
+    raise HTTPException(status_code=404, detail=f"{resource_type}/{resource_id} not found")
 
-# Patient intelligence endpoint was moved before generic routes to avoid routing conflicts
-# See line 166 for the actual implementation
 
 if __name__ == "__main__":
     print("\n" + "="*60)
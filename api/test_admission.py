@@ -0,0 +1,80 @@
+"""
+Admission control tests for PathPilot FHIR API
+Run from api/: python -m pytest
+"""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from admission import AGGREGATE, AdmissionPool, AdmissionRejected, admission_pools
+from cache import clear_all_caches
+
+
+async def hold(pool: AdmissionPool, release: asyncio.Event):
+    async with pool.slot():
+        await release.wait()
+
+
+async def try_slot(pool: AdmissionPool):
+    try:
+        async with pool.slot():
+            return "admitted"
+    except AdmissionRejected as e:
+        return e
+
+
+def test_full_queue_is_rejected_with_429():
+    async def scenario():
+        pool = AdmissionPool("test", max_concurrency=1, max_queue=1, deadline=5)
+        release = asyncio.Event()
+        holder = asyncio.create_task(hold(pool, release))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(try_slot(pool))
+        await asyncio.sleep(0)
+
+        rejected = await try_slot(pool)
+        release.set()
+        await holder
+        return rejected, await queued, pool.get_stats()
+
+    rejected, queued, stats = asyncio.run(scenario())
+    assert isinstance(rejected, AdmissionRejected)
+    assert rejected.status_code == 429
+    assert rejected.retry_after == 5
+    assert queued == "admitted"
+    assert stats["rejected"] == 1 and stats["admitted"] == 2
+
+
+def test_missed_deadline_is_rejected_with_503():
+    async def scenario():
+        pool = AdmissionPool("test", max_concurrency=1, max_queue=1, deadline=0.05)
+        release = asyncio.Event()
+        holder = asyncio.create_task(hold(pool, release))
+        await asyncio.sleep(0)
+
+        rejected = await try_slot(pool)
+        release.set()
+        await holder
+        return rejected, pool.get_stats()
+
+    rejected, stats = asyncio.run(scenario())
+    assert isinstance(rejected, AdmissionRejected)
+    assert rejected.status_code == 503
+    assert rejected.retry_after == 1
+    assert stats["timed_out"] == 1 and stats["waiting"] == 0 and stats["active"] == 0
+
+
+@pytest.mark.parametrize("max_queue, status_code", [(0, 429), (1, 503)])
+def test_middleware_rejection_response(monkeypatch, max_queue, status_code):
+    # No slots at all: requests either find the queue full or time out in it
+    pool = AdmissionPool(AGGREGATE, max_concurrency=0, max_queue=max_queue, deadline=0.05)
+    monkeypatch.setitem(admission_pools, AGGREGATE, pool)
+    clear_all_caches()
+
+    response = TestClient(main.app).get("/api/patient-intelligence")
+    assert response.status_code == status_code
+    assert response.headers["Retry-After"] == "1"
+    assert "aggregate" in response.json()["detail"]
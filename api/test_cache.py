@@ -0,0 +1,31 @@
+"""
+Cache tests for PathPilot FHIR API
+Run from api/: python -m pytest
+"""
+
+import threading
+
+from cache import InMemoryCache
+
+
+def test_concurrent_access_at_capacity():
+    cache = InMemoryCache(max_size=50)
+    errors = []
+
+    def worker(n: int):
+        try:
+            for i in range(5000):
+                key = f"{n}:{i % 200}"
+                if cache.get(key) is None:
+                    cache.set(key, i)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(cache.cache) <= cache.max_size
@@ -0,0 +1,193 @@
+"""
+API tests for PathPilot FHIR API, run against a small synthetic data directory
+Run from api/: python -m pytest
+"""
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from cache import clear_all_caches, resource_cache
+from fhir_index import fhir_index
+
+
+def observation(obs_id: str, patient_id: str, category: str) -> dict:
+    return {
+        "resourceType": "Observation",
+        "id": obs_id,
+        "status": "final",
+        "subject": {"reference": f"Patient/{patient_id}"},
+        "specimen": {"reference": f"Specimen/s-{patient_id}"},
+        "category": [{"coding": [{"code": category}]}]
+    }
+
+
+# p0: 5 observations (2 laboratory); p1: 5 observations (2 laboratory)
+DATA = {
+    'MimicPatient.ndjson': [
+        {"resourceType": "Patient", "id": "p0", "gender": "female", "birthDate": "2080-01-01"},
+        {"resourceType": "Patient", "id": "p1", "gender": "male", "birthDate": "2070-01-01"},
+    ],
+    'MimicSpecimen.ndjson': [
+        {"resourceType": "Specimen", "id": "s-p0", "subject": {"reference": "Patient/p0"}},
+        {"resourceType": "Specimen", "id": "s-p1", "subject": {"reference": "Patient/p1"}},
+    ],
+    'MimicObservationLabevents.ndjson': [
+        observation(f"o-{p}-{i}", p, 'laboratory' if i < 2 else 'vital-signs')
+        for p in ('p0', 'p1') for i in range(5)
+    ],
+    'MimicOrganization.ndjson': [
+        {"resourceType": "Organization", "id": "org1", "name": "Hospital"},
+    ],
+    'MimicLocation.ndjson': [
+        {"resourceType": "Location", "id": "loc1", "name": "ICU"},
+    ],
+    'MimicEncounter.ndjson': [
+        {
+            "resourceType": "Encounter",
+            "id": "e1",
+            "status": "finished",
+            "subject": {"reference": "Patient/p0"},
+            "serviceProvider": {"reference": "Organization/org1"},
+            "location": [{"location": {"reference": "Location/loc1"}}]
+        },
+    ],
+    'MimicMedication.ndjson': [
+        {"resourceType": "Medication", "id": "m1", "code": {"text": "Heparin"}},
+    ],
+    'MimicMedicationRequest.ndjson': [
+        {
+            "resourceType": "MedicationRequest",
+            "id": f"mr{i}",
+            "status": "completed",
+            "subject": {"reference": "Patient/p0"},
+            "medicationReference": {"reference": "Medication/m1"}
+        }
+        for i in range(2)
+    ],
+}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    for filename, resources in DATA.items():
+        (tmp_path / filename).write_text("".join(json.dumps(r) + "\n" for r in resources))
+
+    original_data_dir = main.data_dir
+    monkeypatch.setattr(main, 'data_dir', str(tmp_path))
+    fhir_index.configure(str(tmp_path), main.FILE_MAPPINGS)
+    clear_all_caches()
+    yield TestClient(main.app)
+    clear_all_caches()
+    fhir_index.configure(original_data_dir, main.FILE_MAPPINGS)
+
+
+def test_revinclude_returns_referencing_resources(client):
+    bundle = client.get("/Patient?_count=1&_revinclude=Observation:subject").json()
+    modes = [e["search"]["mode"] for e in bundle["entry"]]
+    assert modes.count("match") == 1
+    assert modes.count("include") == 5
+
+
+def test_revinclude_over_cap_is_truncated_with_warning(client, monkeypatch):
+    monkeypatch.setattr(main, 'MAX_INCLUDED_PER_MATCH', 2)
+    response = client.get("/Patient?_count=1&_revinclude=Observation:subject")
+    assert response.status_code == 200
+    modes = [e["search"]["mode"] for e in response.json()["entry"]]
+    assert modes == ["match", "include", "include", "outcome"]
+    outcome = response.json()["entry"][-1]["resource"]
+    assert outcome["resourceType"] == "OperationOutcome"
+    assert outcome["issue"][0]["severity"] == "warning"
+
+
+def test_include_follows_references_deduplicated(client):
+    bundle = client.get("/MedicationRequest?_include=MedicationRequest:medication").json()
+    included = [e["resource"]["id"] for e in bundle["entry"] if e["search"]["mode"] == "include"]
+    assert bundle["total"] == 2
+    assert included == ["m1"]
+
+
+def test_include_hyphenated_search_parameter(client):
+    bundle = client.get("/Encounter?_include=Encounter:service-provider").json()
+    included = [e["resource"]["id"] for e in bundle["entry"] if e["search"]["mode"] == "include"]
+    assert included == ["org1"]
+
+
+def test_include_resolved_before_elements_projection(client):
+    bundle = client.get("/Encounter?_include=Encounter:location&_elements=status").json()
+    match, include = bundle["entry"]
+    assert "location" not in match["resource"]
+    assert include["resource"]["id"] == "loc1"
+
+
+def test_category_count_uses_observation_route(client):
+    bundle = client.get("/Observation?category=laboratory&_summary=count").json()
+    assert bundle["total"] == 4
+    assert bundle["entry"] == []
+
+
+def test_count_from_index(client):
+    assert client.get("/Observation?_summary=count").json()["total"] == 10
+    assert client.get("/Observation?patient=p0&_summary=count").json()["total"] == 5
+
+
+def test_unsupported_summary_is_ignored(client):
+    response = client.get("/Observation?_summary=true&_count=3")
+    assert response.status_code == 200
+    assert len(response.json()["entry"]) == 3
+
+
+def test_patient_and_category_filter(client):
+    bundle = client.get("/Observation?patient=p0&category=laboratory").json()
+    assert sorted(e["resource"]["id"] for e in bundle["entry"]) == ["o-p0-0", "o-p0-1"]
+
+
+def test_cold_index_is_classified_as_full_scan(client):
+    params = {"patient": "p0"}
+    assert main.classify_request("/Observation", params) == main.FULL_SCAN
+    assert main.classify_request("/Observation/o-p0-0", {}) == main.FULL_SCAN
+
+    fhir_index.build_all()
+    assert main.classify_request("/Observation", params) == main.INDEXED_SEARCH
+    assert main.classify_request("/Observation/o-p0-0", {}) == main.BY_ID
+    assert main.classify_request("/Observation", {"category": "laboratory"}) == main.FULL_SCAN
+
+
+def test_different_categories_in_sequence(client):
+    cached_before = resource_cache.get_stats()["size"]
+    for _ in range(3):
+        laboratory = client.get("/Observation?category=laboratory").json()
+        vital_signs = client.get("/Observation?category=vital-signs").json()
+        assert len(laboratory["entry"]) == 4
+        assert len(vital_signs["entry"]) == 6
+        assert client.get("/Observation?category=laboratory&_summary=count").json()["total"] == 4
+        assert client.get("/Observation?category=vital-signs&_summary=count").json()["total"] == 6
+
+    # Filtered scans are keyed by closures, so they must bypass the memoised reader
+    assert resource_cache.get_stats()["size"] == cached_before
+
+
+def test_elements_projection(client):
+    for resource in (
+        client.get("/Encounter/e1?_elements=status").json(),
+        client.get("/Encounter?_elements=status").json()["entry"][0]["resource"],
+    ):
+        assert resource["status"] == "finished"
+        assert "subject" not in resource and "location" not in resource
+        assert {"code": "SUBSETTED"}.items() <= resource["meta"]["tag"][-1].items()
+
+
+def test_warm_aggregate_skips_admission(client):
+    assert main.classify_request("/patients-summary", {"_count": "2"}) == main.AGGREGATE
+    assert client.get("/patients-summary?_count=2").status_code == 200
+    assert main.classify_request("/patients-summary", {"_count": "2"}) is None
+    assert main.classify_request("/patients-summary", {"_count": "5"}) == main.AGGREGATE
+
+
+def test_unfiltered_page_classification(client):
+    assert main.classify_request("/Patient", {"_count": "10"}) == main.INDEXED_SEARCH
+    assert main.classify_request("/Patient", {}) == main.INDEXED_SEARCH
+    assert main.classify_request("/Patient", {"_count": "5000"}) == main.FULL_SCAN
+    assert main.classify_request("/Patient", {"_count": "0"}) == main.FULL_SCAN